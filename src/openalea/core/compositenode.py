@@ -555,8 +555,11 @@ class CompositeNode(Node, DataFlow):
         """
         self.__call__()
 
+        # Only notify an actual status change, if someone listens
+        was_modified = self.modified
         self.modified = False
-        self.notify_listeners(("status_modified", self.modified))
+        if was_modified and self.listeners:
+            self.notify_listeners(("status_modified", self.modified))
 
         return False
 
@@ -1108,12 +1111,12 @@ class CompositeNodeInput(Node):
 
     def set_input(self, input_pid, val=None, *args):
         """ Define input value """
-        index = self.map_index_out[input_pid]
+        index = self._resolve_out(input_pid)
         self.outputs[index] = val
 
     def get_input(self, input_pid):
         """ Return the input value """
-        index = self.map_index_out[input_pid]
+        index = self._resolve_out(input_pid)
         return self.outputs[index]
 
     def eval(self):
@@ -1136,13 +1139,13 @@ class CompositeNodeOutput(Node):
     def get_output(self, output_pid):
         """ Return Output value """
 
-        index = self.map_index_in[output_pid]
+        index = self._resolve_in(output_pid)
         return self.inputs[index]
 
     def set_output(self, output_pid, val):
         """ Define output """
 
-        index = self.map_index_in[output_pid]
+        index = self._resolve_in(output_pid)
         self.inputs[index] = val
 
     def eval(self):
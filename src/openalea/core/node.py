@@ -30,10 +30,11 @@ import six
 import imp
 import inspect
 import importlib
+import numbers
 import os
 import sys
-import string
 import types
+from contextlib import contextmanager
 from copy import copy, deepcopy
 from weakref import ref, proxy
 
@@ -44,13 +45,36 @@ from .actor import IActor
 from .metadatadict import MetaDataDict, HasAdHoc
 from .interface import TypeNameInterfaceMap
 
-from six.moves import range
+from six.moves import range, intern
 try:
     from types import TypeType, ClassType
 except ImportError:
     TypeType = type
     ClassType = type
 
+try:
+    from functools import lru_cache
+except ImportError:
+    # Python 2: no caching
+    def lru_cache(maxsize=128):
+        return lambda func: func
+
+def _integer_index(index_key):
+    """
+    Return index_key as a port index if it is an integer of another type
+    than int (bool, long, numpy integers...). Must be called while
+    handling the KeyError of the name lookup, which is raised again
+    otherwise.
+    """
+    if isinstance(index_key, numbers.Integral):
+        return int(index_key)
+    raise
+
+
+# Return types of a multi output node that are not wrapped into a tuple
+_SEQ_TYPES = (tuple, list)
+
+
 def cmp(x, y):
     """
     Replacement for built-in function cmp that was removed in Python 3
@@ -297,6 +321,13 @@ class Node(AbstractNode):
                 conversionTxt = "('internal_state_changed', 'key', value)"
         return conversionTxt, retEvent
 
+    # Batched input notifications (see batch_updates)
+    _batch_depth = 0
+    _batch_inputs = None
+
+    # True if eval can call self.func directly instead of __call__
+    _call_func = False
+
     def __init__(self, inputs=(), outputs=()):
         """
 
@@ -311,6 +342,10 @@ class Node(AbstractNode):
         self.clear_inputs()
         self.clear_outputs()
         self.set_io(inputs, outputs)
+        self._init_state()
+
+    def _init_state(self):
+        """ Set the state and internal data of a new node """
 
         # Node State
         self.modified = True
@@ -328,6 +363,42 @@ class Node(AbstractNode):
         # Observed object to notify final nodes wich are continuously evaluated
         self.continuous_eval = Observed()
 
+    def release(self):
+        """
+        Give the node back to its factory, which may reuse it for a next
+        instantiation. The node must not be used anymore after this call.
+
+        Nothing in openalea.core calls it: removed nodes may still be
+        referenced (e.g. for undo), so only callers owning the node
+        should release it.
+        """
+        factory = self.factory
+        if factory is not None and hasattr(factory, 'release_node'):
+            factory.release_node(self)
+
+    def _recycle(self):
+        """
+        Reset the node as if it was newly created with the same ports.
+        Port lists are reset in place.
+        """
+        AbstractNode.__init__(self)
+        self._init_state()
+
+        for port in list(self.input_desc) + list(self.output_desc):
+            Observed.__init__(port)
+            HasAdHoc.__init__(port)
+
+        outputs = self.outputs
+        for i in range(len(outputs)):
+            outputs[i] = None
+
+        inputs = self.inputs
+        input_states = self.input_states
+        for i, port in enumerate(self.input_desc):
+            inputs[i] = self._default_input_value(port)
+            input_states[i] = None
+            port.get_ad_hoc_dict().set_metadata("hide", port.get("hide", False))
+
     def notify_listeners(self, event):
         txt, trevent = Node.is_deprecated_event(event)
         if txt:
@@ -348,8 +419,10 @@ class Node(AbstractNode):
         self.transfer_listeners(other)
         # other.internal_data.update(self.internal_data)
         other.get_ad_hoc_dict().update(self.get_ad_hoc_dict())
-        for portOld, portNew in zip(self.input_desc + self.output_desc,
-                                    other.input_desc + other.output_desc):
+        for portOld, portNew in zip(list(self.input_desc) +
+                                    list(self.output_desc),
+                                    list(other.input_desc) +
+                                    list(other.output_desc)):
             portOld.copy_to(portNew)
 
     def get_process_obj(self):
@@ -377,9 +450,52 @@ class Node(AbstractNode):
         :rtype: InputPort
 
         """
-        index = self.map_index_in[name]
+        try:
+            index = name if name.__class__ is int else self._name_to_in[name]
+        except KeyError:
+            index = _integer_index(name)
         return self.input_desc[index]
 
+    def _resolve_in(self, index_key):
+        """ Return the input index of index_key (an index or a name) """
+        try:
+            return (index_key if index_key.__class__ is int
+                    else self._name_to_in[index_key])
+        except KeyError:
+            return _integer_index(index_key)
+
+    def _resolve_out(self, index_key):
+        """ Return the output index of index_key (an index or a name) """
+        try:
+            return (index_key if index_key.__class__ is int
+                    else self._name_to_out[index_key])
+        except KeyError:
+            return _integer_index(index_key)
+
+    def get_map_index_in(self):
+        """ Return a dict mapping input names and indices to indices.
+
+        Kept for backward compatibility: the dict is built on each call,
+        use get_input or _resolve_in to access a port.
+        """
+        d = dict(self._name_to_in)
+        d.update((i, i) for i in range(len(self.inputs)))
+        return d
+
+    map_index_in = property(get_map_index_in)
+
+    def get_map_index_out(self):
+        """ Return a dict mapping output names and indices to indices.
+
+        Kept for backward compatibility: the dict is built on each call,
+        use get_output or _resolve_out to access a port.
+        """
+        d = dict(self._name_to_out)
+        d.update((i, i) for i in range(len(self.outputs)))
+        return d
+
+    map_index_out = property(get_map_index_out)
+
     ##############
     # Properties #
     ##############
@@ -440,7 +556,11 @@ class Node(AbstractNode):
 
     def is_port_hidden(self, index_key):
         """ Return the hidden state of a port """
-        index = self.map_index_in[index_key]
+        try:
+            index = (index_key if index_key.__class__ is int
+                     else self._name_to_in[index_key])
+        except KeyError:
+            index = _integer_index(index_key)
         s = self.input_desc[index].is_hidden() # get('hide', False)
         changed = self.internal_data["port_hide_changed"]
 
@@ -458,7 +578,11 @@ class Node(AbstractNode):
         :param index_key: the input port index.
         :param state: a boolean value.
         """
-        index = self.map_index_in[index_key]
+        try:
+            index = (index_key if index_key.__class__ is int
+                     else self._name_to_in[index_key])
+        except KeyError:
+            index = _integer_index(index_key)
         s = self.input_desc[index].is_hidden() # get('hide', False)
 
         changed = self.internal_data["port_hide_changed"]
@@ -481,11 +605,49 @@ class Node(AbstractNode):
         This method is called when the input value has changed.
         """
         self.modified = True
-        index = self.map_index_in[index_key]
+        try:
+            index = (index_key if index_key.__class__ is int
+                     else self._name_to_in[index_key])
+        except KeyError:
+            index = _integer_index(index_key)
         if(notify):
+            if self._batch_inputs is not None:
+                self._batch_inputs.append(index)
+                return
             self.notify_listeners(("input_modified", index))
             self.continuous_eval.notify_listeners(("node_modified",))
 
+    @contextmanager
+    def batch_updates(self):
+        """
+        Context manager coalescing the input notifications.
+
+        Inside the block, modified inputs do not send any "input_modified"
+        event. When the outermost block exits, listeners receive a single
+        ("inputs_modified", indices) event with the list of modified
+        input indices (without duplicates, in modification order).
+
+            with node.batch_updates():
+                node.set_input(0, 1)
+                node.set_input('b', 2)
+        """
+        if not self._batch_depth:
+            self._batch_inputs = []
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                indices = []
+                for index in self._batch_inputs:
+                    if index not in indices:
+                        indices.append(index)
+                self._batch_inputs = None
+                if indices:
+                    self.notify_listeners(("inputs_modified", indices))
+                    self.continuous_eval.notify_listeners(("node_modified",))
+
     # Declarations
     def set_io(self, inputs, outputs):
         """
@@ -495,18 +657,37 @@ class Node(AbstractNode):
         :param outputs: list of dict(name='X', interface=IFloat)
         """
 
+        # Only the changed side is rebuilt: seal both again (see seal)
+        sealed = self.input_desc.__class__ is tuple
+
         # # Values
+        # Port lists are allocated once with their final size
+        # and filled in place.
         if(inputs is None or len(inputs) != len(self.inputs)):
             self.clear_inputs()
             if inputs:
-                for d in inputs:
-                    self.add_input(**d)
+                nb = len(inputs)
+                self.inputs = [None] * nb
+                self.input_desc = [None] * nb
+                self.input_states = [None] * nb
+                for index, d in enumerate(inputs):
+                    self._init_input_port(index, dict(d))
+                for port in self.input_desc:
+                    self.notify_listeners(("input_port_added", port))
 
         if(outputs is None or len(outputs) != len(self.outputs)):
             self.clear_outputs()
             if outputs:
-                for d in outputs:
-                    self.add_output(**d)
+                nb = len(outputs)
+                self.outputs = [None] * nb
+                self.output_desc = [None] * nb
+                for index, d in enumerate(outputs):
+                    self._init_output_port(index, dict(d))
+                for port in self.output_desc:
+                    self.notify_listeners(("output_port_added", port))
+
+        if sealed:
+            self.seal()
 
         # to_script
         self._to_script_func = None
@@ -516,8 +697,8 @@ class Node(AbstractNode):
         self.inputs = []
         # Description (list of dict (name=, interface=, ...))
         self.input_desc = []
-        # translation of name to id or id to id (identity)...
-        self.map_index_in = {}
+        # translation of name to id (ids are used as is)
+        self._name_to_in = {}
         # Input states : "connected", "hidden"
         self.input_states = []
         self.notify_listeners(("cleared_input_ports",))
@@ -527,16 +708,67 @@ class Node(AbstractNode):
         self.outputs = []
         # Description (list of dict (name=, interface=, ...))
         self.output_desc = []
-        # translation of name to id or id to id (identity)...
-        self.map_index_out = {}
+        # translation of name to id (ids are used as is)
+        self._name_to_out = {}
         self.notify_listeners(("cleared_output_ports",))
 
 
+    def seal(self):
+        """
+        Freeze the port descriptions once the ports are declared:
+        input_desc and output_desc become tuples.
+        Adding a port afterwards turns them back into lists.
+        """
+        self.input_desc = tuple(self.input_desc)
+        self.output_desc = tuple(self.output_desc)
+
+    def _unseal(self):
+        """ Make the port descriptions mutable again (see seal) """
+        if self.input_desc.__class__ is tuple:
+            self.input_desc = list(self.input_desc)
+        if self.output_desc.__class__ is tuple:
+            self.output_desc = list(self.output_desc)
+
     def add_input(self, **kargs):
         """ Create an input port """
+        self._unseal()
+        self.inputs.append(None)
+        self.input_desc.append(None)
+        self.input_states.append(None)
+
+        port = self._init_input_port(len(self.inputs) - 1, kargs)
+        self.notify_listeners(("input_port_added", port))
+        return port
+
+    def _init_input_port(self, index, kargs):
+        """ Create the input port of the already allocated slot index """
 
         # Get parameters
-        name = str(kargs['name'])
+        # force to have a string, interned as port names are shared by
+        # many nodes and used as keys
+        name = intern(str(kargs['name']))
+        value = self._default_input_value(kargs)
+
+        port = InputPort(self)
+        port.update(kargs)
+        self.input_desc[index] = port
+
+        self._name_to_in[name] = index
+        port.set_id(index)
+
+        # a new port always invalidates the node, whatever its value
+        self.inputs[index] = value
+        self.unvalidate_input(index, False)
+        port.get_ad_hoc_dict().set_metadata("hide",
+                                            kargs.get("hide", False))
+        return port
+
+    @staticmethod
+    def _default_input_value(kargs):
+        """
+        Return a copy of the default value of the input described by kargs.
+        A string interface is replaced by its class in kargs.
+        """
         interface = kargs.get('interface', None)
 
         # default value
@@ -551,42 +783,30 @@ class Node(AbstractNode):
         else:
             value = kargs.get('value', None)
 
-        value = copy(value)
+        return copy(value)
 
-        name = str(name) # force to have a string
-        self.inputs.append(None)
-
-        port = InputPort(self)
-        port.update(kargs)
-        self.input_desc.append(port)
-
-        self.input_states.append(None)
-        index = len(self.inputs) - 1
-        self.map_index_in[name] = index
-        self.map_index_in[index] = index
-        port.set_id(index)
+    def add_output(self, **kargs):
+        """ Create an output port """
+        self._unseal()
+        self.outputs.append(None)
+        self.output_desc.append(None)
 
-        self.set_input(name, value, False)
-        port.get_ad_hoc_dict().set_metadata("hide",
-                                            kargs.get("hide", False))
-        self.notify_listeners(("input_port_added", port))
+        port = self._init_output_port(len(self.outputs) - 1, kargs)
+        self.notify_listeners(("output_port_added", port))
         return port
 
-    def add_output(self, **kargs):
-        """ Create an output port """
+    def _init_output_port(self, index, kargs):
+        """ Create the output port of the already allocated slot index """
 
         # Get parameters
-        name = str(kargs['name'])
-        self.outputs.append(None)
+        name = intern(str(kargs['name']))
 
         port = OutputPort(self)
         port.update(kargs)
-        self.output_desc.append(port)
-        index = len(self.outputs) - 1
-        self.map_index_out[name] = index
-        self.map_index_out[index] = index
+        self.output_desc[index] = port
+
+        self._name_to_out[name] = index
         port.set_id(index)
-        self.notify_listeners(("output_port_added", port))
         return port
 
     # I/O Functions
@@ -595,13 +815,20 @@ class Node(AbstractNode):
         """
         Define the input value for the specified index/key
         """
-        index = self.map_index_in[key]
+        try:
+            index = key if key.__class__ is int else self._name_to_in[key]
+        except KeyError:
+            index = _integer_index(key)
 
         changed = True
         if(self.lazy):
             # Test if the inputs has changed
+            current = self.inputs[index]
+            if current is val:
+                # same object: no need for a (possibly costly) comparison
+                return
             try:
-                changed = (cmp(self.inputs[index], val) != 0)
+                changed = (cmp(current, val) != 0)
             except:
                 pass
 
@@ -614,7 +841,10 @@ class Node(AbstractNode):
         Define the input value for the specified index/key
         """
 
-        index = self.map_index_out[key]
+        try:
+            index = key if key.__class__ is int else self._name_to_out[key]
+        except KeyError:
+            index = _integer_index(key)
         self.outputs[index] = val
         self.notify_listeners(("output_modified", key, val))
 
@@ -623,22 +853,38 @@ class Node(AbstractNode):
 
     def get_input(self, index_key):
         """ Return the input value for the specified index/key """
-        index = self.map_index_in[index_key]
+        try:
+            index = (index_key if index_key.__class__ is int
+                     else self._name_to_in[index_key])
+        except KeyError:
+            index = _integer_index(index_key)
         return self.inputs[index]
 
     def get_output(self, index_key):
         """ Return the output for the specified index/key """
-        index = self.map_index_out[index_key]
+        try:
+            index = (index_key if index_key.__class__ is int
+                     else self._name_to_out[index_key])
+        except KeyError:
+            index = _integer_index(index_key)
         return self.outputs[index]
 
     def get_input_state(self, index_key):
-        index = self.map_index_in[index_key]
+        try:
+            index = (index_key if index_key.__class__ is int
+                     else self._name_to_in[index_key])
+        except KeyError:
+            index = _integer_index(index_key)
         return self.input_states[index]
 
     def set_input_state(self, index_key, state):
         """ Set the state of the input index/key (state is a string) """
 
-        index = self.map_index_in[index_key]
+        try:
+            index = (index_key if index_key.__class__ is int
+                     else self._name_to_in[index_key])
+        except KeyError:
+            index = _integer_index(index_key)
         self.input_states[index] = state
         self.unvalidate_input(index)
 
@@ -664,36 +910,46 @@ class Node(AbstractNode):
         if (self.delay == 0 and self.lazy) and not self.modified:
             return False
 
-        self.notify_listeners(("start_eval",))
+        # Nobody to notify: skip building and dispatching the events
+        if self.listeners:
+            self.notify_listeners(("start_eval",))
 
         # Run the node
-        outlist = self.__call__(self.inputs)
+        if self._call_func:
+            func = self.func
+            outlist = func(*self.inputs) if func else None
+        else:
+            outlist = self.__call__(self.inputs)
 
         # Copy outputs
+        outputs = self.outputs
+        output_desc = self.output_desc
         # only one output
-        if len(self.outputs) == 1:
+        if len(outputs) == 1:
             try:
                 if hasattr(outlist, "__getitem__") and len(outlist) == 1:
-                    self.outputs[0] = outlist[0]
+                    outputs[0] = outlist[0]
                 else:
-                    self.outputs[0] = outlist
+                    outputs[0] = outlist
             except TypeError:
-                self.outputs[0] = outlist
+                outputs[0] = outlist
 
-            self.output_desc[0].notify_listeners(("tooltip_modified",))
+            if output_desc[0].listeners:
+                output_desc[0].notify_listeners(("tooltip_modified",))
 
         else: # multi output
-            if(not isinstance(outlist, tuple) and
-               not isinstance(outlist, list)):
+            if(not isinstance(outlist, _SEQ_TYPES)):
                 outlist = (outlist,)
 
-            for i in range(min(len(outlist), len(self.outputs))):
-                self.output_desc[i].notify_listeners(("tooltip_modified",))
-                self.outputs[i] = outlist[i]
+            for i, value in zip(range(len(outputs)), outlist):
+                if output_desc[i].listeners:
+                    output_desc[i].notify_listeners(("tooltip_modified",))
+                outputs[i] = value
 
         # Set State
         self.modified = False
-        self.notify_listeners(("stop_eval",))
+        if self.listeners:
+            self.notify_listeners(("stop_eval",))
 
         if self.delay == 0:
             return False
@@ -743,6 +999,12 @@ class Node(AbstractNode):
         return odict
 
     def __setstate__(self, dict):
+        # Old pickles store both name -> id and id -> id maps
+        for old, new in (('map_index_in', '_name_to_in'),
+                         ('map_index_out', '_name_to_out')):
+            if old in dict:
+                dict[new] = {k: v for k, v in dict.pop(old).items()
+                             if not isinstance(k, int)}
         self.__dict__.update(dict)
 
         for port in self.input_desc:
@@ -807,6 +1069,8 @@ class FuncNode(Node):
         Node.__init__(self, inputs, outputs)
         self.func = func
         self.__doc__ = func.__doc__
+        # Subclasses overriding __call__ are evaluated through it
+        self._call_func = (type(self).__call__ == FuncNode.__call__)
 
     def __call__(self, inputs=()):
         """ Call function. Must be overriden """
@@ -1031,12 +1295,29 @@ def Alias(factory, name):
         factory.alias.append(name)
 
 
+# Modules loaded by the node factories (name -> (module, source path)),
+# shared so that factories of the same module import it only once.
+_MODULE_CACHE = {}
+
+
+@lru_cache(maxsize=32)
+def _compile_src(src):
+    """
+    Return the code object of src. Code objects are cached, since the
+    code editor applies the same source again and again.
+    """
+    return compile(src, '<string>', 'exec')
+
+
 class NodeFactory(AbstractFactory):
     """
     A Node factory is able to create nodes on demand,
     and their associated widgets.
     """
 
+    # Maximum number of released nodes kept for reuse
+    pool_size = 32
+
     def __init__(self,
                  name,
                  description='',
@@ -1083,19 +1364,27 @@ class NodeFactory(AbstractFactory):
         # Cache
         self.nodeclass = None
         self.src_cache = None
+        # (class object, True if it is a node class, inputs, outputs)
+        # of the last instantiate
+        self._node_class_check = None
+        # Released nodes which can be reused by instantiate
+        self._node_pool = []
 
         # Module path, value=0
         self.nodemodule_path = None
+        # Copy the list: the caller directory is appended below
         if(not search_path):
             self.search_path = []
         else:
-            self.search_path = search_path
+            self.search_path = list(search_path)
 
         self.module_cache = None
 
         # Context directory
-        # inspect.stack()[1][1] is the caller python module
-        caller_dir = os.path.dirname(os.path.abspath(inspect.stack()[1][1]))
+        # sys._getframe(1) is the caller frame: unlike inspect.stack(),
+        # it does not read the source context of every frame
+        caller_file = sys._getframe(1).f_code.co_filename
+        caller_dir = os.path.dirname(os.path.abspath(caller_file))
         if(not caller_dir in self.search_path):
             self.search_path.append(caller_dir)
 
@@ -1118,11 +1407,15 @@ class NodeFactory(AbstractFactory):
         odict['nodemodule'] = None
         odict['nodeclass'] = None
         odict['module_cache'] = None
+        odict['_node_class_check'] = None
+        odict['_node_pool'] = []
         odict['__pkg__'] = None # remove weakref reference
 
         return odict
 
     def __setstate__(self, dict):
+        self._node_class_check = None
+        self._node_pool = []
         self.__dict__.update(dict)
         self.get_pkg()
 
@@ -1152,14 +1445,35 @@ class NodeFactory(AbstractFactory):
 
         # The module contains the node implementation.
         module = self.get_node_module()
-        classobj = module.__dict__.get(self.nodeclass_name, None)
+        # module level class or function (classobj may be replaced below
+        # by a functor instance)
+        nodeclass = module.__dict__.get(self.nodeclass_name, None)
+        classobj = nodeclass
 
         if classobj is None:
             raise Exception("Cannot instantiate '" + \
                 self.nodeclass_name + "' from " + str(module))
 
+        # The check is cached for the class object: a new source or a
+        # module reload replaces the class, and so invalidates it.
+        check = self._node_class_check
+        if check is None or check[0] is not nodeclass:
+            is_node_class = (isinstance(nodeclass, type) and
+                             issubclass(nodeclass, AbstractNode))
+        else:
+            is_node_class = check[1]
+
+        # Released nodes wrap the previous class or ports
+        if (check is None or check[0] is not nodeclass or
+            check[2] is not self.inputs or check[3] is not self.outputs):
+            del self._node_pool[:]
+
+        # Reuse a released node
+        if self._node_pool:
+            node = self._node_pool.pop()
+
         # If class is not a Node, embed object in a Node class
-        if(not hasattr(classobj, 'mro') or not AbstractNode in classobj.mro()):
+        elif(not is_node_class):
 
             # Check inputs and outputs
             if(self.inputs is None):
@@ -1201,8 +1515,43 @@ class NodeFactory(AbstractFactory):
         if self.toscriptclass_name is not None :
             node._to_script_func = module.__dict__.get(self.toscriptclass_name, None)
 
+        # Ports are declared
+        if isinstance(node, Node):
+            node.seal()
+
+        self._node_class_check = (nodeclass, is_node_class,
+                                  self.inputs, self.outputs)
         return node
 
+    def release_node(self, node):
+        """
+        Keep node for reuse by a next instantiate (see Node.release).
+
+        Only function nodes created by this factory, with unchanged ports
+        and calling the module level function or class itself, are kept,
+        up to pool_size nodes. Functor nodes, whose func is an instance
+        created for the node, are not kept. The pool is emptied when the
+        factory class, inputs or outputs change.
+        Return True if the node has been kept.
+        """
+        pool = self._node_pool
+        check = self._node_class_check
+        if (len(pool) >= self.pool_size or
+            type(node) is not FuncNode or
+            node.factory is not self or
+            check is None or
+            node.func is not check[0] or
+            node.func is not self.get_classobj() or
+            check[2] is not self.inputs or check[3] is not self.outputs or
+            len(node.input_desc) != len(self.inputs) or
+            len(node.output_desc) != len(self.outputs) or
+            any(n is node for n in pool)):
+            return False
+
+        node._recycle()
+        pool.append(node)
+        return True
+
     def instantiate_widget(self, node=None, parent=None,
                             edit=False, autonomous=False):
         """ Return the corresponding widget initialised with node """
@@ -1272,6 +1621,16 @@ class NodeFactory(AbstractFactory):
             not hasattr(self.module_cache, 'oa_invalidate')):
             return self.module_cache
 
+        # Test if the module has already been loaded by another factory
+        cached = _MODULE_CACHE.get(self.nodemodule_name)
+        if cached is not None:
+            nodemodule, nodemodule_path = cached
+            if (not hasattr(nodemodule, 'oa_invalidate') and
+                sys.modules.get(self.nodemodule_name) is nodemodule):
+                self.nodemodule_path = nodemodule_path
+                self.module_cache = nodemodule
+                return nodemodule
+
         sav_path = sys.path
         sys.path = self.search_path + sav_path
         # print 'SEARCH PATH ', self.search_path
@@ -1293,6 +1652,8 @@ class NodeFactory(AbstractFactory):
                 print(type_error)
 
             self.module_cache = nodemodule
+            _MODULE_CACHE[self.nodemodule_name] = (nodemodule,
+                                                   self.nodemodule_path)
             sys.path = sav_path
             return nodemodule
 
@@ -1342,7 +1703,7 @@ class NodeFactory(AbstractFactory):
         module = self.get_node_module()
 
         # Run src
-        exec(newsrc, module.__dict__)
+        exec(_compile_src(newsrc), module.__dict__)
 
         # save the current newsrc
         self.src_cache = newsrc
@@ -1353,26 +1714,30 @@ class NodeFactory(AbstractFactory):
         containing the source.
         """
         module = self.get_node_module()
-        nodesrc = self.get_node_src(cache=False)
 
-        # Run src
-        exec(newsrc, module.__dict__)
+        # get the lines of the old code in the file
+        import linecache
+        linecache.checkcache(self.nodemodule_path)
+        cl = module.__dict__[self.nodeclass_name]
+        nodelines, start = inspect.getsourcelines(cl)
+        nodesrc = ''.join(nodelines)
 
-        # get the module code
-        import inspect
-        modulesrc = inspect.getsource(module)
+        # Run src
+        exec(_compile_src(newsrc), module.__dict__)
 
         # Pass if no modications
         if(nodesrc == newsrc):
             return
 
         # replace old code with new one
-        modulesrc = modulesrc.replace(nodesrc, newsrc)
-
+        myfile = open(self.nodemodule_path)
+        modulelines = myfile.readlines()
+        myfile.close()
+        modulelines[start - 1:start - 1 + len(nodelines)] = [newsrc]
 
         # write file
         myfile = open(self.nodemodule_path, 'w')
-        myfile.write(modulesrc)
+        myfile.writelines(modulelines)
         myfile.close()
 
         # reload module
@@ -1381,10 +1746,9 @@ class NodeFactory(AbstractFactory):
 
         self.src_cache = None
         m = self.get_node_module()
-        # reload(m)
-        # Recompile
-        # import py_compile
-        # py_compile.compile(self.nodemodule_path)
+        # No explicit recompilation (py_compile) here: the import system
+        # compares the source mtime with the cached bytecode and only
+        # regenerates it on the next import of a modified file.
 
 # Class Factory:
 Factory = NodeFactory
@@ -1393,18 +1757,20 @@ Factory = NodeFactory
 class PyNodeFactoryWriter(object):
     """ NodeFactory python Writer """
 
+    __slots__ = ('factory',)
+
     nodefactory_template = """
 
-$NAME = Factory(name=$PNAME,
-                authors=$AUTHORS,
-                description=$DESCRIPTION,
-                category=$CATEGORY,
-                nodemodule=$NODEMODULE,
-                nodeclass=$NODECLASS,
-                inputs=$LISTIN,
-                outputs=$LISTOUT,
-                widgetmodule=$WIDGETMODULE,
-                widgetclass=$WIDGETCLASS,
+%(NAME)s = Factory(name=%(PNAME)s,
+                authors=%(AUTHORS)s,
+                description=%(DESCRIPTION)s,
+                category=%(CATEGORY)s,
+                nodemodule=%(NODEMODULE)s,
+                nodeclass=%(NODECLASS)s,
+                inputs=%(LISTIN)s,
+                outputs=%(LISTOUT)s,
+                widgetmodule=%(WIDGETMODULE)s,
+                widgetclass=%(WIDGETCLASS)s,
                )
 
 """
@@ -1415,21 +1781,21 @@ $NAME = Factory(name=$PNAME,
     def __repr__(self):
         """ Return the python string representation """
         f = self.factory
-        fstr = string.Template(self.nodefactory_template)
 
         name = f.get_python_name()
         name = name.replace('.', '_')
-        result = fstr.safe_substitute(NAME=name,
-                                      AUTHORS=repr(f.get_authors()),
-                                      PNAME=repr(f.name),
-                                      DESCRIPTION=repr(f.description),
-                                      CATEGORY=repr(f.category),
-                                      NODEMODULE=repr(f.nodemodule_name),
-                                      NODECLASS=repr(f.nodeclass_name),
-                                      LISTIN=repr(f.inputs),
-                                      LISTOUT=repr(f.outputs),
-                                      WIDGETMODULE=repr(f.widgetmodule_name),
-                                      WIDGETCLASS=repr(f.widgetclass_name),)
+        result = self.nodefactory_template % dict(
+            NAME=name,
+            AUTHORS=repr(f.get_authors()),
+            PNAME=repr(f.name),
+            DESCRIPTION=repr(f.description),
+            CATEGORY=repr(f.category),
+            NODEMODULE=repr(f.nodemodule_name),
+            NODECLASS=repr(f.nodeclass_name),
+            LISTIN=repr(f.inputs),
+            LISTOUT=repr(f.outputs),
+            WIDGETMODULE=repr(f.widgetmodule_name),
+            WIDGETCLASS=repr(f.widgetclass_name),)
         return result
 
 # Utility functions
@@ -6,6 +6,7 @@ __license__ = "Cecill-C"
 __revision__ = " $Id$ "
 
 from openalea.core.node import *
+from openalea.core.observer import AbstractListener
 
 
 def test_funcnode():
@@ -43,6 +44,12 @@ def MyFunc(a, b):
     return a + b
 
 
+class MyFunctor(object):
+
+    def __call__(self, a, b):
+        return a * b
+
+
 def test_node():
     """ Test Node creation"""
     inputs = (dict(name='x', interface=None, value=None), )
@@ -156,3 +163,265 @@ def test_node_output():
     n2.eval()
     assert n1.get_output('y') == 1
     assert n2.get_output('y') == [1, 2]
+
+
+def test_port_index_map():
+    """ Ports are reachable by name or index """
+    inputs = (dict(name='x', interface=None, value=1),
+              dict(name='y', interface=None, value=2))
+    outputs = (dict(name='z', interface=None), )
+
+    n = FuncNode(inputs, outputs, MyFunc)
+    assert n.get_input('y') == n.get_input(1) == 2
+    assert n.map_index_in == {'x': 0, 'y': 1, 0: 0, 1: 1}
+    assert n.map_index_out == {'z': 0, 0: 0}
+
+    n.eval()
+    assert n.get_output('z') == n.get_output(0) == 3
+
+    # any integer type is an index
+    assert n.get_input(True) == 2
+    assert n.get_output(False) == 3
+    n.set_input(True, 5)
+    assert n.get_input('y') == 5
+    try:
+        n.get_input('w')
+        assert False
+    except KeyError:
+        pass
+
+
+def test_factory_search_path():
+    """ The factory does not modify the given search path """
+    search_path = ['/tmp']
+    f1 = Factory(name="F1", search_path=search_path)
+    f2 = Factory(name="F2", search_path=search_path)
+
+    assert search_path == ['/tmp']
+    assert f1.search_path == f2.search_path
+    assert f1.search_path is not f2.search_path
+    assert len(f1.search_path) == 2
+
+
+class Uncomparable(object):
+    """ Object whose comparison fails """
+
+    def __gt__(self, other):
+        raise TypeError()
+
+    __lt__ = __eq__ = __ne__ = __gt__
+
+
+def test_set_input_same_object():
+    """ Setting the same object again does not invalidate a lazy node """
+    inputs = (dict(name='x', interface=None, value=None), )
+    outputs = (dict(name='y', interface=None), )
+
+    n = FuncNode(inputs, outputs, lambda x: x)
+    value = Uncomparable()
+    n.set_input(0, value)
+    n.eval()
+    assert not n.modified
+
+    n.set_input(0, value)
+    assert not n.modified
+
+    n.set_input(0, Uncomparable())
+    assert n.modified
+
+
+class EventRecorder(AbstractListener):
+    """ Listener storing the received events """
+
+    def __init__(self, observed):
+        AbstractListener.__init__(self)
+        self.events = []
+        self.initialise(observed)
+
+    def notify(self, sender, event=None):
+        self.events.append(event)
+
+
+def test_batch_updates():
+    """ Input notifications are coalesced inside batch_updates """
+    inputs = (dict(name='a', interface=None, value=0),
+              dict(name='b', interface=None, value=0))
+    outputs = (dict(name='c', interface=None), )
+
+    n = FuncNode(inputs, outputs, MyFunc)
+    recorder = EventRecorder(n)
+
+    with n.batch_updates():
+        n.set_input('b', 1)
+        with n.batch_updates():
+            n.set_input(0, 1)
+        n.set_input('b', 2)
+        assert recorder.events == []
+
+    assert recorder.events == [("inputs_modified", [1, 0])]
+
+    n.set_input('a', 2)
+    assert recorder.events[-1] == ("input_modified", 0)
+
+
+def test_factory_release():
+    """ Released nodes are reused by their factory """
+    f = Factory(name="MyFactory2",
+                nodemodule="test_node",
+                nodeclass="MyFunc",
+               )
+
+    n = f.instantiate()
+    n.set_input(0, 1)
+    n.set_input(1, 2)
+    n.eval()
+    n.set_caption("my node")
+    recorder = EventRecorder(n)
+
+    n.release()
+    n2 = f.instantiate()
+    assert n2 is n
+    assert n2.caption == "MyFactory2"
+    assert n2.modified
+    assert n2.get_input(0) is None
+    assert n2.get_output(0) is None
+    assert not n2.listeners
+
+    n3 = f.instantiate()
+    assert n3 is not n2
+
+    # functor nodes own their functor: they are not reused
+    f = Factory(name="MyFunctor",
+                nodemodule="test_node",
+                nodeclass="MyFunctor",
+               )
+
+    n = f.instantiate()
+    n.set_caption("my functor")
+    n.release()
+    assert n.factory is f
+    assert n.caption == "my functor"
+    assert not f._node_pool
+    assert f.instantiate() is not n
+
+
+def test_factory_seal():
+    """ Instantiated nodes have frozen port descriptions """
+    f = Factory(name="MyFactory2",
+                nodemodule="test_node",
+                nodeclass="MyFunc",
+               )
+
+    n = f.instantiate()
+    assert isinstance(n.input_desc, tuple)
+    assert isinstance(n.output_desc, tuple)
+
+    n.add_input(name='c', interface=None, value=0)
+    assert n.get_nb_input() == 3
+    assert n.get_input_port('c') is n.input_desc[2]
+
+
+def test_eval_events():
+    """ Evaluation events are sent only to existing listeners """
+    inputs = (dict(name='x', interface=None, value=1), )
+    outputs = (dict(name='y', interface=None), )
+
+    n = FuncNode(inputs, outputs, lambda x: 3 * x)
+    n.eval()
+    assert n.get_output(0) == 3
+
+    recorder = EventRecorder(n)
+    port_recorder = EventRecorder(n.output_desc[0])
+    n.set_input(0, 2)
+    del recorder.events[:]
+    n.eval()
+    assert n.get_output(0) == 6
+    assert recorder.events == [("start_eval",), ("stop_eval",)]
+    assert port_recorder.events == [("tooltip_modified",)]
+
+
+def test_seal_set_io():
+    """ set_io on a sealed node keeps both port descriptions sealed """
+    f = Factory(name="MyFactory2",
+                nodemodule="test_node",
+                nodeclass="MyFunc",
+               )
+
+    n = f.instantiate()
+    n.set_io(f.inputs, (dict(name='c', interface=None),
+                        dict(name='d', interface=None)))
+    assert isinstance(n.input_desc, tuple)
+    assert isinstance(n.output_desc, tuple)
+    assert n.get_nb_output() == 2
+
+    m = f.instantiate()
+    m.set_io(f.inputs, n.output_desc)
+    n.copy_to(m)
+
+    # clearing one side only must not break the port iteration
+    n.clear_outputs()
+    n.copy_to(m)
+
+
+def test_factory_release_new_ports():
+    """ Released nodes are not reused once the factory ports change """
+    f = Factory(name="MyFactory2",
+                nodemodule="test_node",
+                nodeclass="MyFunc",
+                inputs=(dict(name='a', interface=None, value=1),
+                        dict(name='b', interface=None, value=2)),
+                outputs=(dict(name='c', interface=None), ),
+               )
+
+    n = f.instantiate()
+    f.inputs = (dict(name='x', interface=None, value=10),
+                dict(name='y', interface=None, value=20))
+    n.release()
+    n2 = f.instantiate()
+    assert n2 is not n
+    assert [p['name'] for p in n2.input_desc] == ['x', 'y']
+    assert n2.inputs == [10, 20]
+
+    n2.release()
+    f.outputs = (dict(name='z', interface=None), )
+    n3 = f.instantiate()
+    assert n3 is not n2
+    assert n3.output_desc[0]['name'] == 'z'
+
+
+def test_set_io_modified():
+    """ New input ports invalidate an evaluated node """
+    inputs = (dict(name='x', interface=None, value=None), )
+    outputs = (dict(name='y', interface=None), )
+
+    n = FuncNode(inputs, outputs, lambda *args: len(args))
+    n.eval()
+    assert not n.modified
+
+    n.set_io((dict(name='a'), dict(name='b')), n.output_desc)
+    assert n.modified
+    n.eval()
+    assert n.get_output(0) == 2
+
+    n.add_input(name='c')
+    assert n.modified
+
+
+def test_factory_functor():
+    """ Functor nodes get their own functor, the class check is cached """
+    import test_node
+    f = Factory(name="MyFunctor",
+                nodemodule="test_node",
+                nodeclass="MyFunctor",
+               )
+
+    n1 = f.instantiate()
+    n2 = f.instantiate()
+    assert isinstance(n1.func, test_node.MyFunctor)
+    assert n1.func is not n2.func
+    assert f._node_class_check[0] is test_node.MyFunctor
+
+    n1.set_input(0, 2)
+    n1.set_input(1, 3)
+    n1.eval()
+    assert n1.get_output(0) == 6